@@ -1,5 +1,9 @@
+import io
+import os
+import json
 import time
-import requests
+import asyncio
+import aiohttp
 import random
 import sys
 
@@ -7,8 +11,16 @@ import sys
 PROXY_URL = "http://localhost:8080/v1"
 HEADERS = {
     "X-Switchboard-Token": "demo_token_123",
-    "X-Agent-Id": "traffic_gen"
+    "X-Agent-Id": "traffic_gen",
+    "Content-Type": "application/json"
 }
+# Requests in flight per batch; raise for higher sustained RPS
+_concurrency = os.getenv("TRAFFIC_CONCURRENCY", "1")
+if not _concurrency.isdigit() or int(_concurrency) < 1:
+    sys.exit(f"TRAFFIC_CONCURRENCY must be a positive integer, got {_concurrency!r}")
+CONCURRENCY = int(_concurrency)
+PERIOD = 2.0  # Seconds between batch starts
+REQUEST_TIMEOUT = 5  # Seconds per request
 
 # Payload templates
 NORMAL_REQUEST = {
@@ -26,44 +38,93 @@ SQL_REQUEST = {
     "messages": [{"role": "user", "content": "DROP TABLE users;"}]
 }
 
+# Templates never change, so serialize them once
+NORMAL_BODY = json.dumps(NORMAL_REQUEST).encode()
+PII_BODY = json.dumps(PII_REQUEST).encode()
+SQL_BODY = json.dumps(SQL_REQUEST).encode()
+
+# Traffic mix: 60% normal, 20% PII, 20% destructive
+PAYLOADS = [
+    (NORMAL_BODY, "Normal Request"),
+    (PII_BODY, "PII Request"),
+    (SQL_BODY, "Destructive Request")
+]
+WEIGHTS = [0.6, 0.2, 0.2]
+
+# Block-buffered stdout; flushed once per batch instead of on every line
+_out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', write_through=False)
+
+# Timestamp only changes once per second, so reuse the last formatted value
+_last_s = -1
+_last_str = ""
+
 def log(msg):
-    print(f"[{time.strftime('%H:%M:%S')}] {msg}")
+    global _last_s, _last_str
+    t = int(time.time())
+    if t != _last_s:
+        _last_s = t
+        _last_str = time.strftime('%H:%M:%S', time.localtime(t))
+    _out.write(f"[{_last_str}] {msg}\n")
 
-def send_request(payload, type_label):
+async def send_request(session, body, type_label):
     try:
-        res = requests.post(f"{PROXY_URL}/chat/completions", json=payload, headers=HEADERS, timeout=5)
-        status = res.status_code
-        if status == 200:
-            log(f"✅ {type_label}: 200 OK")
-        elif status == 403:
-            log(f"🛡️ {type_label}: 403 BLOCKED (Firewall active)")
-        elif status == 502:
-            log(f"⚠️ {type_label}: 502 (Allowed but upstream failed - Shadow Mode?)")
-        else:
-            log(f"❓ {type_label}: {status}")
+        async with session.post(f"{PROXY_URL}/chat/completions", data=body) as res:
+            status = res.status
+    except asyncio.TimeoutError:
+        # aiohttp timeouts carry an empty message, so spell it out
+        log(f"❌ {type_label}: Failed - timeout after {REQUEST_TIMEOUT}s")
+        return
     except Exception as e:
         log(f"❌ {type_label}: Failed - {e}")
+        return
+    if status == 200:
+        log(f"✅ {type_label}: 200 OK")
+    elif status == 403:
+        log(f"🛡️ {type_label}: 403 BLOCKED (Firewall active)")
+    elif status == 502:
+        log(f"⚠️ {type_label}: 502 (Allowed but upstream failed - Shadow Mode?)")
+    else:
+        log(f"❓ {type_label}: {status}")
 
-def main():
-    log("🚀 Starting Traffic Generator for Dynamic UI Demo...")
-    count = 1
-    try:
+def gen():
+    # Draw payloads in batches so the RNG cost is amortized
+    while True:
+        yield from random.choices(PAYLOADS, weights=WEIGHTS, k=1024)
+
+async def run():
+    payloads = gen()
+    # One session and keep-alive pool shared by every in-flight request
+    conn = aiohttp.TCPConnector(limit=64, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=conn, headers=HEADERS, timeout=timeout) as session:
+        count = 1
+        # Schedule batches on a fixed cadence so request latency doesn't add to the delay
+        next_ts = time.monotonic()
         while True:
-            # Mix of traffic
-            r = random.random()
-            
-            if r < 0.6:
-                send_request(NORMAL_REQUEST, "Normal Request")
-            elif r < 0.8:
-                send_request(PII_REQUEST, "PII Request")
-            else:
-                send_request(SQL_REQUEST, "Destructive Request")
+            await asyncio.gather(*(
+                send_request(session, *next(payloads)) for _ in range(CONCURRENCY)
+            ))
             
             log(f"--- Batch {count} complete. Waiting... ---")
+            _out.flush()
             count += 1
-            time.sleep(2) # 2 seconds delay
+            next_ts += PERIOD
+            slack = next_ts - time.monotonic()
+            if slack > 0:
+                await asyncio.sleep(slack)
+            else:
+                # Fell behind; restart the cadence rather than bursting to catch up
+                next_ts = time.monotonic()
+
+def main():
+    log("🚀 Starting Traffic Generator for Dynamic UI Demo...")
+    _out.flush()
+    try:
+        asyncio.run(run())
     except KeyboardInterrupt:
         log("\n🛑 Traffic generator stopped")
+    finally:
+        _out.flush()
 
 if __name__ == "__main__":
     main()